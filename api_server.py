@@ -1,131 +1,322 @@
-import json
-import traceback
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import os
+import asyncio
+import logging
+import orjson
+import cachetools
+import numpy as np
+from quart import Quart, request
+from quart_cors import cors
+from redis import Redis
+from rq import Queue
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
 
 from analyzer import (
-    analyze_script,
-    simplify_queries,
-    batch_score_relevance,
+    analyze_and_simplify,
+    batch_score_relevance_multi,
     estimate_legal_use,
+    get_best_sentence_indices,
     get_keyword_positions,
     fetch_articles,
-    get_best_sentence_indices,
-    deduplicate_articles
+    deduplicate_articles,
+    split_sentences,
+    embed_sentences
 )
 
-app = Flask(__name__)
-CORS(app)
+# INFO by default so debug-level formatting work is skipped in production.
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-def handle_script_analysis(script_text):
-    import re
+# Quart is the async-native Flask API: requests share one event loop with
+# the in-flight fetches instead of each holding a worker thread.
+app = Quart(__name__)
+app = cors(app)
 
-    # 1. Split script into sentences
-    sentences = re.split(r'(?<=[.?!])\s+', script_text.strip())
+def json_response(payload, status=200):
+    # orjson serializes straight to bytes, several times faster than the
+    # stdlib encoder behind jsonify on large result payloads.
+    return app.response_class(
+        orjson.dumps(payload), status=status, mimetype="application/json"
+    )
 
-    # 2. Extract main topics, keywords, and raw queries
-    parsed = analyze_script(script_text)
-    parsed["keywords"] = [k for k in parsed["keywords"] if isinstance(k, str)]
+# Cap on concurrent SerpAPI/NewsAPI fetches so the fan-out stays inside the
+# providers' rate limits.
+FETCH_CONCURRENCY = 8
 
-    # 3. Simplify queries
-    simplified = simplify_queries(parsed["queries"])
-    flattened = []
-    for q in simplified:
-        if isinstance(q, list):
-            flattened.append(" ".join(q))
-        else:
-            flattened.append(str(q))
-    simplified = flattened
-
-    all_results = []
-
-    # 4. For each simplified query: fetch, score, filter, position
-    for query in simplified:
-        articles = fetch_articles(query)
-        if not articles:
-            continue
+# Queries whose best article recently scored below the relevance cutoff
+# rarely recover within minutes; remember their top score and skip their
+# fetch+score work entirely while the entry is fresh.
+RELEVANCE_CUTOFF = 80
+_dead_queries = cachetools.TTLCache(maxsize=1024, ttl=300)
 
-        scores = batch_score_relevance(query, parsed["keywords"], articles)
-        filtered = []
-        for art, score in zip(articles, scores):
-            if score >= 80:
-                art["relevance_score"] = score
-                art["query"] = query
-                filtered.append(art)
-        if not filtered:
+def _live_queries(queries):
+    live = []
+    for q in queries:
+        top = _dead_queries.get(q.lower().strip())
+        if top is not None and top < RELEVANCE_CUTOFF:
             continue
+        live.append(q)
+    return live
+
+def _record_top_scores(grouped, score_blocks):
+    for (q, _), scores in zip(grouped, score_blocks):
+        # Only queries whose articles were actually scored get an entry: an
+        # empty block just means the fetch failed or dedup attributed its
+        # articles elsewhere, not that the query is dead.
+        if scores:
+            _dead_queries[q.lower().strip()] = max(scores)
+
+# Analyses run 10-60+ seconds end to end; enqueueing them keeps web workers
+# free to accept new requests while `rq worker analysis` processes jobs.
+_redis = Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+job_queue = Queue("analysis", connection=_redis)
 
-        positions = get_best_sentence_indices(script_text, filtered)
-        for art, pos in zip(filtered, positions):
-            all_results.append({
-                "query":      art["query"],
-                "title":      art["title"],
-                "url":        art["url"],
-                "description":art["desc"],
-                "date":       art.get("date", ""),
-                "script_position": pos,
-                "relevance_score": art["relevance_score"]
-            })
-
-    # 5. Deduplicate across all queries
-    all_results = deduplicate_articles(all_results)
-
-    # 6. If no results, return empty structure
-    if not all_results:
-        return {
-            "main_topics":       parsed["main_topics"],
-            "keywords":          parsed["keywords"],
-            "queries":           parsed["queries"],
-            "simplified_queries": simplified,
-            "results":           []
-        }
-
-    # 7. Estimate legal use
-    legal = estimate_legal_use(all_results)
-    for art, label in zip(all_results, legal):
+# One persistent loop per worker process: the pooled httpx/OpenAI clients
+# bind keep-alive connections to the loop they first ran on, so a fresh
+# asyncio.run loop per job would reuse connections from a closed loop and
+# fail on the second job.
+_worker_loop = None
+
+def run_script_analysis(script_text):
+    # RQ workers are synchronous; drive the async pipeline to completion here.
+    global _worker_loop
+    if _worker_loop is None:
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop.run_until_complete(handle_script_analysis(script_text))
+
+async def process_query(query, articles, scores, sentence_embeddings):
+    # Label and position only the survivors of the shared scoring pass --
+    # legal labels resolve locally for known domains and alignment is a
+    # local embedding assignment.
+    if not articles:
+        return []
+
+    scores = np.asarray(scores)
+    keep = np.flatnonzero(scores >= RELEVANCE_CUTOFF)
+    if not keep.size:
+        return []
+
+    survivors = [articles[i] for i in keep]
+    # Legal labelling and sentence alignment are independent; overlap them.
+    legal, positions = await asyncio.gather(
+        estimate_legal_use(survivors),
+        get_best_sentence_indices(sentence_embeddings, survivors)
+    )
+    # Mutate the surviving dicts in place rather than copying each one into
+    # a fresh result dict.
+    for i, art, label, pos in zip(keep, survivors, legal, positions):
+        art["description"] = art.pop("desc", "")
+        art.setdefault("date", "")
+        art["script_position"] = pos
+        art["relevance_score"] = int(scores[i])
         art["legal_use"] = label
+    return survivors
+
+async def handle_script_analysis(script_text):
+    # 1. Split script into sentences, once, with the shared pattern
+    sentences = split_sentences(script_text)
 
-    # 8. Sort by script position then date
-    sorted_results = sorted(
-        all_results,
-        key=lambda x: (x["script_position"], x["date"] or "")
+    # 2. Extract main topics, keywords, queries and their simplified
+    #    keyword phrases in one call
+    parsed = await analyze_and_simplify(script_text)
+    parsed["keywords"] = [k for k in parsed["keywords"] if isinstance(k, str)]
+
+    # Keyword positioning is pure CPU and only needs the analysis output, so
+    # it runs in a worker thread underneath the fetch/scoring network waits.
+    positions_task = asyncio.create_task(
+        asyncio.to_thread(get_keyword_positions, sentences, parsed["keywords"])
     )
 
-    # 9. Assign sequential result numbers
-    for idx, art in enumerate(sorted_results, start=1):
-        art["result_number"] = idx
+    # 3. Simplified queries arrive as flat strings (enforced by the prompt
+    #    and the msgspec shape), so no per-item flattening is needed
+    simplified = parsed["simplified"]
+
+    # 4. Fetch every query concurrently under a bounded semaphore
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch_bounded(q):
+        async with sem:
+            return await fetch_articles(q)
+
+    # Sentence embeddings are query-invariant; compute them once while the
+    # fetches are in flight and share them across every alignment call.
+    sent_embs_task = asyncio.create_task(embed_sentences(sentences))
+
+    live = _live_queries(simplified)
+    fetched = await asyncio.gather(*[fetch_bounded(q) for q in live])
+
+    # 5. Deduplicate once across all queries (not per fetch), so an article
+    #    returned by two related queries is only scored once
+    for query, articles in zip(live, fetched):
+        for art in articles:
+            art["query"] = query
+    unique_articles = deduplicate_articles([a for arts in fetched for a in arts])
 
-    # 10. Return full payload
+    # 6. Score every query's articles in one batched LLM call
+    grouped = [
+        (q, [a for a in unique_articles if a["query"] == q])
+        for q in live
+    ]
+    score_blocks = await batch_score_relevance_multi(
+        [(q, parsed["keywords"], arts) for q, arts in grouped]
+    )
+    _record_top_scores(grouped, score_blocks)
+
+    # 7. Filter, label and position per query, all concurrently
+    sent_embs = await sent_embs_task
+    per_query = await asyncio.gather(*[
+        process_query(q, arts, scores, sent_embs)
+        for (q, arts), scores in zip(grouped, score_blocks)
+    ])
+    all_results = [r for chunk in per_query for r in chunk]
+
+    # 8. Sort by script position then date: one C-level lexsort instead of
+    #    a Python tuple comparison per element
+    if all_results:
+        positions = np.fromiter(
+            (r["script_position"] for r in all_results),
+            dtype=np.int32, count=len(all_results)
+        )
+        dates = np.array([r["date"] or "" for r in all_results])
+        order = np.lexsort((dates, positions))
+        # Number the results while reordering: one pass instead of a
+        # separate enumerate loop.
+        sorted_results = []
+        for idx, i in enumerate(order, 1):
+            art = all_results[i]
+            art["result_number"] = idx
+            sorted_results.append(art)
+    else:
+        sorted_results = []
+
+    # 9. Return full payload
     return {
         "main_topics":       parsed["main_topics"],
         "keywords":          parsed["keywords"],
+        "keyword_positions": await positions_task,
         "queries":           parsed["queries"],
         "simplified_queries": simplified,
         "results":           sorted_results
     }
 
+async def stream_script_analysis(script_text):
+    # Progressive variant of handle_script_analysis: yields the analysis
+    # header first, then one payload per query as soon as its articles are
+    # scored, labeled and positioned, then the keyword positions.
+    sentences = split_sentences(script_text)
+
+    parsed = await analyze_and_simplify(script_text)
+    parsed["keywords"] = [k for k in parsed["keywords"] if isinstance(k, str)]
+
+    positions_task = asyncio.create_task(
+        asyncio.to_thread(get_keyword_positions, sentences, parsed["keywords"])
+    )
+
+    simplified = parsed["simplified"]
+
+    yield {
+        "main_topics":        parsed["main_topics"],
+        "keywords":           parsed["keywords"],
+        "queries":            parsed["queries"],
+        "simplified_queries": simplified
+    }
+
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch_bounded(q):
+        async with sem:
+            return await fetch_articles(q)
+
+    live = _live_queries(simplified)
+    sent_embs_task = asyncio.create_task(embed_sentences(sentences))
+    fetched = await asyncio.gather(*[fetch_bounded(q) for q in live])
+    for query, articles in zip(live, fetched):
+        for art in articles:
+            art["query"] = query
+    unique_articles = deduplicate_articles([a for arts in fetched for a in arts])
+
+    grouped = [
+        (q, [a for a in unique_articles if a["query"] == q])
+        for q in live
+    ]
+    score_blocks = await batch_score_relevance_multi(
+        [(q, parsed["keywords"], arts) for q, arts in grouped]
+    )
+    _record_top_scores(grouped, score_blocks)
+
+    sent_embs = await sent_embs_task
+
+    async def finish_query(q, arts, scores):
+        return q, await process_query(q, arts, scores, sent_embs)
+
+    tasks = [
+        asyncio.create_task(finish_query(q, arts, scores))
+        for (q, arts), scores in zip(grouped, score_blocks)
+    ]
+    for task in asyncio.as_completed(tasks):
+        query, results = await task
+        yield {"query": query, "results": results}
+
+    yield {"keyword_positions": await positions_task}
+
+@app.route("/analyze_script_stream", methods=["POST"])
+async def analyze_script_stream():
+    # Chunked NDJSON: the client gets the first query's results after one
+    # query's latency instead of waiting for the whole pipeline, and the
+    # server never holds the full result set in memory.
+    try:
+        data = orjson.loads(await request.get_data())
+        script_text = data.get("script_text", "").strip()
+        if not script_text:
+            return json_response({"error": "No script_text provided"}, 400)
+    except Exception as e:
+        return json_response({"error": str(e)}, 400)
+
+    async def generate():
+        try:
+            async for chunk in stream_script_analysis(script_text):
+                yield orjson.dumps(chunk) + b"\n"
+        except Exception as e:
+            logger.exception("Streaming analysis failed")
+            yield orjson.dumps({"error": str(e)}) + b"\n"
+
+    return app.response_class(generate(), mimetype="application/x-ndjson")
+
 @app.route("/analyze_script", methods=["POST"])
-def analyze_script_endpoint():
+async def analyze_script_endpoint():
     try:
-        data = request.get_json()
+        data = orjson.loads(await request.get_data())
         script_text = data.get("script_text", "").strip()
         if not script_text:
-            return jsonify({"error": "No script_text provided"}), 400
+            return json_response({"error": "No script_text provided"}, 400)
 
-        result = handle_script_analysis(script_text)
-        return jsonify(result)
+        job = job_queue.enqueue(run_script_analysis, script_text)
+        return json_response({"job_id": job.id}, 202)
 
     except Exception as e:
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        logger.exception("Failed to enqueue script analysis")
+        return json_response({"error": str(e)}, 500)
+
+@app.route("/jobs/<job_id>")
+async def job_status(job_id):
+    try:
+        job = Job.fetch(job_id, connection=_redis)
+    except NoSuchJobError:
+        return json_response({"error": "Unknown job"}, 404)
+
+    if job.is_finished:
+        return json_response({"status": "finished", "result": job.result})
+    if job.is_failed:
+        return json_response({"status": "failed", "error": "Analysis failed"}, 500)
+    return json_response({"status": job.get_status()})
 
 # Optional alias for backward compatibility
 @app.route("/process_script", methods=["POST"])
-def process_script():
-    return analyze_script_endpoint()
+async def process_script():
+    return await analyze_script_endpoint()
 
+# Production runs under hypercorn (see Procfile); this path is local dev only.
 if __name__ == "__main__":
     import os
     port = int(os.environ.get("PORT", 10000))
-    app.run(host="0.0.0.0", port=port, debug=True)
-
+    app.run(host="0.0.0.0", port=port)